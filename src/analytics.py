@@ -0,0 +1,256 @@
+# Copyright 2024 Joel Ikels
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import numpy as np
+import pandas as pd
+
+PAIR_COLUMNS = ['From Label', 'To Label']
+
+# Typical intervals of standing orders and subscriptions, in days
+PERIODS = {
+    'weekly': 7,
+    'biweekly': 14,
+    'monthly': 30.44,
+    'quarterly': 91.31,
+    'yearly': 365.25,
+}
+
+class TransactionAnalytics:
+    # Recurring payments and outliers per (From Label, To Label) pair. All
+    # statistics are computed on the rows sorted by pair and date, with
+    # grouped pandas aggregations and NumPy cumulative sums, so there is no
+    # Python loop over pairs.
+    def __init__(self, min_occurrences=4, min_unmatched_occurrences=6, max_interval_dispersion=0.25,
+                 max_short_interval_dispersion=0.1, max_amount_dispersion=0.2, period_tolerance=0.15,
+                 window=10, min_periods=3, z_threshold=3.0, min_std=0.01):
+        self.min_occurrences = min_occurrences
+        self.min_unmatched_occurrences = min_unmatched_occurrences
+        self.max_short_interval_dispersion = max_short_interval_dispersion
+        self.max_interval_dispersion = max_interval_dispersion
+        self.max_amount_dispersion = max_amount_dispersion
+        self.period_tolerance = period_tolerance
+        self.window = window
+        self.min_periods = min_periods
+        self.z_threshold = z_threshold
+        self.min_std = min_std
+        self.pairs = self._empty_pairs()
+        self.outliers = self._empty_outliers()
+
+    def compute(self, data):
+        self.pairs, self.outliers = self._analyse(data)
+        return self.pairs
+
+    def update(self, data, new_rows):
+        # Only pairs that received new rows are recomputed
+        affected = pd.MultiIndex.from_frame(new_rows[PAIR_COLUMNS]).unique()
+        data_mask = pd.MultiIndex.from_frame(data[PAIR_COLUMNS]).isin(affected)
+        pairs, outliers = self._analyse(data[data_mask])
+
+        keep_pairs = ~pd.MultiIndex.from_frame(self.pairs[PAIR_COLUMNS]).isin(affected)
+        keep_outliers = ~pd.MultiIndex.from_frame(self.outliers[PAIR_COLUMNS]).isin(affected)
+        self.pairs = pd.concat([self.pairs[keep_pairs], pairs], ignore_index=True)
+        self.outliers = pd.concat([self.outliers[keep_outliers], outliers])
+        return self.pairs
+
+    def annotate_pairs(self, grouped_data, from_date=None, to_date=None):
+        # Adds the per-pair results to aggregated data as returned by filter_data.
+        # Outliers are only counted inside the requested date range.
+        outliers = self.outliers
+        if from_date is not None:
+            outliers = outliers[outliers['Date'] >= from_date]
+        if to_date is not None:
+            outliers = outliers[outliers['Date'] <= to_date]
+        outlier_counts = outliers.groupby(PAIR_COLUMNS).size().rename('Outliers').reset_index()
+
+        annotated = grouped_data.merge(
+            self.pairs[PAIR_COLUMNS + ['Recurring', 'Period']],
+            on=PAIR_COLUMNS, how='left'
+        ).merge(outlier_counts, on=PAIR_COLUMNS, how='left')
+        annotated['Recurring'] = annotated['Recurring'].fillna(False).astype(bool)
+        annotated['Period'] = annotated['Period'].fillna('').astype(str)
+        annotated['Outliers'] = annotated['Outliers'].fillna(0).astype(int)
+        return annotated
+
+    def get_recurring_payments(self):
+        return self.pairs[self.pairs['Recurring']].sort_values(PAIR_COLUMNS)
+
+    def get_outliers(self):
+        return self.outliers.sort_values('Date')
+
+    def _analyse(self, data):
+        if data.empty:
+            return self._empty_pairs(), self._empty_outliers()
+
+        ordered = data[PAIR_COLUMNS + ['Date', 'Amount in Euro']].sort_values(
+            PAIR_COLUMNS + ['Date'], kind='stable'
+        )
+        codes = ordered.groupby(PAIR_COLUMNS, sort=False).ngroup().to_numpy()
+        row_count = len(codes)
+
+        # Row positions where a new pair starts, and the start of each row's pair
+        first_in_pair = np.ones(row_count, dtype=bool)
+        first_in_pair[1:] = codes[1:] != codes[:-1]
+        pair_starts = np.flatnonzero(first_in_pair)
+        row_starts = pair_starts[np.cumsum(first_in_pair) - 1]
+
+        dates = ordered['Date'].to_numpy(dtype='datetime64[ns]')
+        amounts = ordered['Amount in Euro'].to_numpy(dtype=float)
+        intervals = np.empty(row_count)
+        intervals[0] = np.nan
+        intervals[1:] = np.diff(dates).astype('timedelta64[s]').astype(float) / 86400
+        intervals[first_in_pair] = np.nan
+
+        pairs = self._pair_statistics(ordered, codes, pair_starts, intervals, amounts)
+        outlier_mask, rolling_mean, rolling_std, z_scores = self._rolling_outliers(
+            codes, first_in_pair, row_starts, amounts
+        )
+
+        pairs['Outliers'] = np.bincount(codes[outlier_mask], minlength=len(pairs))
+        outliers = ordered[outlier_mask].assign(**{
+            'Rolling Mean': rolling_mean[outlier_mask],
+            'Rolling Std': rolling_std[outlier_mask],
+            'Z Score': z_scores[outlier_mask]
+        })
+        return pairs, outliers
+
+    def _pair_statistics(self, ordered, codes, pair_starts, intervals, amounts):
+        stats = pd.DataFrame({
+            'code': codes,
+            'interval': intervals,
+            'amount': amounts
+        }).groupby('code', sort=True).agg(
+            count=('amount', 'size'),
+            amount_mean=('amount', 'mean'),
+            amount_median=('amount', 'median'),
+            interval_median=('interval', 'median')
+        )
+        amount_median = stats['amount_median'].to_numpy()
+        interval_median = stats['interval_median'].to_numpy()
+
+        # Dispersion is the scaled median absolute deviation relative to the
+        # median, so a single odd payment or missed month does not hide an
+        # otherwise regular pair
+        deviations = pd.DataFrame({
+            'code': codes,
+            'interval': np.abs(intervals - interval_median[codes]),
+            'amount': np.abs(amounts - amount_median[codes])
+        }).groupby('code', sort=True).median()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            interval_dispersion = 1.4826 * deviations['interval'].to_numpy() / interval_median
+            amount_dispersion = 1.4826 * deviations['amount'].to_numpy() / amount_median
+
+        # Closest typical period, if the median interval is within tolerance
+        period_names = np.array(list(PERIODS.keys()) + [''], dtype=object)
+        period_days = np.array(list(PERIODS.values()))
+        deviation = np.abs(interval_median[:, None] / period_days[None, :] - 1)
+        closest = np.argmin(np.nan_to_num(deviation, nan=np.inf), axis=1)
+        matched = np.take_along_axis(deviation, closest[:, None], axis=1)[:, 0] <= self.period_tolerance
+
+        # With only a handful of intervals the dispersion is noisy, so short
+        # histories must match a typical period and be tighter to count
+        interval_dispersion_filled = np.nan_to_num(interval_dispersion, nan=np.inf)
+        short_history = stats['count'].to_numpy() < self.min_unmatched_occurrences
+        recurring = (
+            (stats['count'].to_numpy() >= self.min_occurrences) &
+            (interval_median >= 1) &
+            (interval_dispersion_filled <= self.max_interval_dispersion) &
+            (np.nan_to_num(amount_dispersion, nan=np.inf) <= self.max_amount_dispersion) &
+            (~short_history | (matched & (interval_dispersion_filled <= self.max_short_interval_dispersion)))
+        )
+
+        period = np.where(recurring, period_names[np.where(matched, closest, len(PERIODS))], '')
+        period = np.where(recurring & ~matched, 'regular', period)
+
+        last_dates = ordered['Date'].to_numpy(dtype='datetime64[ns]')[np.r_[pair_starts[1:], len(codes)] - 1]
+        next_expected = last_dates + np.round(np.nan_to_num(interval_median) * 86400).astype('timedelta64[s]')
+
+        labels = ordered.iloc[pair_starts][PAIR_COLUMNS].reset_index(drop=True)
+        return labels.assign(**{
+            'Transactions': stats['count'].to_numpy(),
+            'Mean Amount': stats['amount_mean'].to_numpy(),
+            'Median Amount': amount_median,
+            'Amount Dispersion': amount_dispersion,
+            'Median Interval Days': interval_median,
+            'Interval Dispersion': interval_dispersion,
+            'Recurring': recurring,
+            'Period': period,
+            'Next Expected': pd.to_datetime(np.where(recurring, next_expected, np.datetime64('NaT')))
+        })
+
+    def _rolling_outliers(self, codes, first_in_pair, row_starts, amounts):
+        # Mean and std of the previous `window` amounts of the same pair, from
+        # prefix sums. Amounts are centred on their pair mean and the prefix
+        # sums restart at every pair, so they stay small and each pair's
+        # result depends only on its own rows.
+        row_count = len(codes)
+        pair_means = np.bincount(codes, weights=amounts) / np.bincount(codes)
+        centred = amounts - pair_means[codes]
+
+        prefix = self._pair_prefix_sums(codes, first_in_pair, centred)
+        prefix_squared = self._pair_prefix_sums(codes, first_in_pair, centred ** 2)
+
+        positions = np.arange(row_count)
+        window_start = np.maximum(positions - self.window, row_starts)
+        previous = positions - window_start
+
+        window_sum = prefix[positions] - prefix[window_start]
+        window_sum_squared = prefix_squared[positions] - prefix_squared[window_start]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            window_mean = window_sum / previous
+            window_var = (window_sum_squared - window_sum ** 2 / previous) / (previous - 1)
+        window_std = np.maximum(np.sqrt(np.clip(np.nan_to_num(window_var), 0, None)), self.min_std)
+        z_scores = np.nan_to_num((centred - window_mean) / window_std)
+
+        outlier_mask = (previous >= self.min_periods) & (np.abs(z_scores) > self.z_threshold)
+        return outlier_mask, window_mean + pair_means[codes], window_std, z_scores
+
+    @staticmethod
+    def _pair_prefix_sums(codes, first_in_pair, values):
+        # Sum of the earlier rows of the same pair, zero at each pair's start
+        inclusive = pd.Series(values).groupby(codes, sort=False).cumsum().to_numpy()
+        prefix = np.zeros(len(values))
+        prefix[1:] = inclusive[:-1]
+        prefix[first_in_pair] = 0.0
+        return prefix
+
+    @staticmethod
+    def _empty_pairs():
+        return pd.DataFrame({
+            'From Label': pd.Series(dtype=str),
+            'To Label': pd.Series(dtype=str),
+            'Transactions': pd.Series(dtype=int),
+            'Mean Amount': pd.Series(dtype=float),
+            'Median Amount': pd.Series(dtype=float),
+            'Amount Dispersion': pd.Series(dtype=float),
+            'Median Interval Days': pd.Series(dtype=float),
+            'Interval Dispersion': pd.Series(dtype=float),
+            'Recurring': pd.Series(dtype=bool),
+            'Period': pd.Series(dtype=str),
+            'Next Expected': pd.Series(dtype='datetime64[ns]'),
+            'Outliers': pd.Series(dtype=int)
+        })
+
+    @staticmethod
+    def _empty_outliers():
+        return pd.DataFrame({
+            'From Label': pd.Series(dtype=str),
+            'To Label': pd.Series(dtype=str),
+            'Date': pd.Series(dtype='datetime64[ns]'),
+            'Amount in Euro': pd.Series(dtype=float),
+            'Rolling Mean': pd.Series(dtype=float),
+            'Rolling Std': pd.Series(dtype=float),
+            'Z Score': pd.Series(dtype=float)
+        })
@@ -13,24 +13,63 @@
 # limitations under the License.
 
 
+import time
+# Startup timings are measured from here, i.e. they do not include
+# interpreter start-up, PyInstaller unpacking or anything imported earlier
+_import_start = time.perf_counter()
+
 import io
 import os
 import csv
 import json
+import functools
+import threading
 from datetime import datetime, timedelta
 
 import multiprocessing
 multiprocessing.freeze_support()
 
-import pandas as pd
-from flask import Flask, render_template, request, jsonify, url_for, send_file, redirect
+from flask import Flask, render_template, request, jsonify, url_for, send_file, redirect, make_response
 from werkzeug.utils import secure_filename
 
-from src.data_processor import TransactionData
-from src.graph_manager import TransactionGraph
+# pandas, networkx and pyvis are imported inside the routes that need them,
+# so the intro and upload pages are served before the analytics stack is
+# loaded. warm_up_analytics() imports them in the background meanwhile.
 
 app = Flask(__name__)
 
+# Datasets above this many rows get an approximate preview on first render
+PREVIEW_MIN_ROWS = 200000
+PREVIEW_SAMPLE_SIZE = 50000
+PREVIEW_MAX_PAIRS = 500
+
+exact_graph = {'response': None, 'error': None, 'started': False}
+
+startup_metrics = {
+    'app_ready_since_import_seconds': None,
+    'first_request_since_import_seconds': None,
+    'analytics_ready_since_import_seconds': None
+}
+
+def warm_up_analytics():
+    import pandas
+    import networkx
+    import pyvis.network
+    import src.data_processor
+    import src.graph_manager
+    startup_metrics['analytics_ready_since_import_seconds'] = time.perf_counter() - _import_start
+    print(f"Analytics modules loaded {startup_metrics['analytics_ready_since_import_seconds']:.3f}s after app import")
+
+@app.before_request
+def record_first_request():
+    if startup_metrics['first_request_since_import_seconds'] is None:
+        startup_metrics['first_request_since_import_seconds'] = time.perf_counter() - _import_start
+        print(f"First request served {startup_metrics['first_request_since_import_seconds']:.3f}s after app import")
+
+@app.route('/startup_metrics')
+def get_startup_metrics():
+    return jsonify(startup_metrics)
+
 dir_path = os.path.dirname(os.path.realpath(__file__))
 
 # Configure upload folder
@@ -76,21 +115,60 @@ def upload_csv():
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(file_path)
         
+        from src.data_processor import TransactionData
+
         # Load the transaction data
         global transaction_data
         transaction_data = TransactionData(file_path)
+        reset_exact_graph()
         
         return redirect(url_for('index'))
     
     return redirect(url_for('intro'))
 
+@app.route('/append_csv', methods=['POST'])
+def append_csv():
+    if 'transaction_data' not in globals():
+        return redirect(url_for('intro'))
+
+    file = request.files.get('csv_file')
+    if not file or not file.filename.endswith('.csv'):
+        return redirect(url_for('index'))
+
+    filename = secure_filename(file.filename)
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    file.save(file_path)
+
+    # Analytics are only recomputed for the pairs in the appended rows
+    transaction_data.append_data(file_path)
+    reset_exact_graph()
+
+    return redirect(url_for('index'))
+
 @app.route('/visualization')
 def index():
     if 'transaction_data' not in globals():
         return redirect(url_for('intro'))
+
+    from src.graph_manager import TransactionGraph
+
+    # Large datasets first show a graph built from a sample; the exact graph
+    # is computed in the background and fetched from /get_initial_graph
+    large_dataset = len(transaction_data.data) > PREVIEW_MIN_ROWS
+    if large_dataset and exact_graph['response'] is not None:
+        return render_template('index.html',
+                               initial_graph_data={'nodes': [], 'edges': []},
+                               preview=None,
+                               await_exact_graph=True)
+
+    preview = None
+    if large_dataset:
+        graph_source, preview = transaction_data.preview_data(PREVIEW_SAMPLE_SIZE, PREVIEW_MAX_PAIRS)
+    else:
+        graph_source = transaction_data.data
     
     # Create initial graph with all data
-    initial_graph = TransactionGraph(transaction_data.data)
+    initial_graph = TransactionGraph(graph_source)
     initial_graph.create_graph()
     initial_graph.customize_graph(display_amounts=True, proportional_edges=True)
     initial_graph.toggle_physics(enable_physics=True)
@@ -109,18 +187,55 @@ def index():
         'edges': [dict(edge) for edge in initial_graph_data['edges']]
     }
 
-    # Get unique accounts and senders/recipients for dropdowns
-    unique_from_accounts, unique_to_accounts = transaction_data.get_unique_accounts()
-    unique_senders, unique_recipients = transaction_data.get_unique_senders_recipients()
-
-    return render_template('index.html', 
-                           initial_graph_data=serializable_graph_data,
-                           from_accounts=unique_from_accounts,
-                           to_accounts=unique_to_accounts,
-                           senders=unique_senders,
-                           recipients=unique_recipients)
+    # Accounts, senders and recipients are looked up through /search_values
+    response = make_response(render_template('index.html', 
+                                             initial_graph_data=serializable_graph_data,
+                                             preview=preview,
+                                             await_exact_graph=large_dataset))
+
+    # Started once the preview has been sent, so it does not compete with it
+    if large_dataset and not exact_graph['started']:
+        exact_graph['started'] = True
+        response.call_on_close(functools.partial(start_exact_graph, exact_graph, transaction_data))
+    return response
+
+def reset_exact_graph():
+    global exact_graph
+    exact_graph = {'response': None, 'error': None, 'started': False}
+
+def start_exact_graph(job, data):
+    def run():
+        import pandas as pd
+
+        job['error'] = None
+        try:
+            # Same request the page sends on load with the default filter values
+            job['response'] = build_graph_response(
+                data, '', '', '', '', 0, float('inf'),
+                pd.to_datetime('1900-01-01'), pd.to_datetime('2100-12-31'),
+                display_amounts=True, enable_physics=True, proportional_edges=True
+            )
+            print("Exact graph ready")
+        except Exception as e:
+            print(f"Error computing exact graph: {e}")
+            job['error'] = str(e)
+            # Allow the next page load to retry
+            job['started'] = False
+
+    threading.Thread(target=run, daemon=True).start()
+
+@app.route('/get_initial_graph')
+def get_initial_graph():
+    if exact_graph['error'] is not None:
+        return jsonify({'ready': False, 'error': exact_graph['error']})
+    if exact_graph['response'] is None:
+        return jsonify({'ready': False})
+    return jsonify({'ready': True, **exact_graph['response']})
+
 @app.route('/get_graph_data', methods=['POST'])
 def get_graph_data():
+    import pandas as pd
+
     # Extract filter parameters from the request
     from_account = request.form.get('from_account', '')
     to_account = request.form.get('to_account', '')
@@ -134,12 +249,26 @@ def get_graph_data():
     enable_physics = request.form.get('enable_physics') == 'true'
     proportional_edges = request.form.get('proportional_edges') == 'true'
 
+    return jsonify(build_graph_response(
+        transaction_data, from_account, to_account, from_sender, to_recipient,
+        min_amount, max_amount, from_date, to_date,
+        display_amounts, enable_physics, proportional_edges
+    ))
+
+def build_graph_response(transaction_data, from_account, to_account, from_sender, to_recipient,
+                         min_amount, max_amount, from_date, to_date,
+                         display_amounts, enable_physics, proportional_edges):
+    from src.graph_manager import TransactionGraph
+
     # Get filtered and aggregated data
     filtered_data = transaction_data.filter_data(
         from_account, to_account, from_sender, to_recipient,
         min_amount, max_amount, from_date, to_date
     )
 
+    # Mark recurring payments and pairs with unusual transactions
+    filtered_data = transaction_data.analytics.annotate_pairs(filtered_data, from_date, to_date)
+
     # Create and customize graph
     graph = TransactionGraph(filtered_data)
     graph.create_graph()
@@ -164,11 +293,12 @@ def get_graph_data():
         "total_received": recipient_totals.to_dict()
     }
 
-    return jsonify({
+    return {
         "graph_data": graph.get_graph_data(),
         "summary_stats": summary_stats,
         "filtered_data": filtered_data.to_dict('records')
-    })
+    }
+
 @app.route('/get_unique_accounts')
 def get_unique_accounts():
     unique_from_accounts, unique_to_accounts = transaction_data.get_unique_accounts()
@@ -177,8 +307,30 @@ def get_unique_accounts():
         'to_accounts': unique_to_accounts
     })
 
+@app.route('/search_values')
+def search_values():
+    if 'transaction_data' not in globals():
+        return jsonify({'error': 'No transaction data loaded'}), 400
+
+    field = request.args.get('field', '')
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit') or 50), 1), 500)
+        offset = max(int(request.args.get('offset') or 0), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+
+    try:
+        results = transaction_data.search_values(field, query, limit, offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(results)
+
 @app.route('/get_transaction_history', methods=['POST'])
 def get_transaction_history():
+    import pandas as pd
+
     from_label = request.form.get('from_label')
     to_label = request.form.get('to_label')
     
@@ -206,6 +358,8 @@ def get_transaction_history():
 
 @app.route('/get_filtered_transactions', methods=['POST'])
 def get_filtered_transactions():
+    import pandas as pd
+
     use_filters = request.form.get('use_filters') == 'true'
     
     if use_filters:
@@ -264,6 +418,9 @@ def annotate():
     if not os.path.exists(csv_path):
         return "CSV file not found", 404
 
+    import pandas as pd
+    from src.graph_manager import TransactionGraph
+
     # Load the filtered data
     filtered_data = pd.read_csv(csv_path)
 
@@ -277,6 +434,8 @@ def annotate():
     return render_template('annotation.html', initial_graph_data=json.dumps(graph_data))
 @app.route('/save_graph_state', methods=['POST'])
 def save_graph_state():
+    import pandas as pd
+
     data = request.get_json()
     graph_state = data['graph_state']
     filtered_data = data['filtered_data']
@@ -314,6 +473,8 @@ def transaction_table():
 
 @app.route('/download_csv', methods=['POST'])
 def download_csv():
+    import pandas as pd
+
     print("request form: ", request.form)
     use_filters = 'from_account' in request.form or 'from_label' not in request.form
     
@@ -375,6 +536,9 @@ def upload_icon():
     else:
         return jsonify({'success': False, 'error': 'Invalid file type'})
 
+startup_metrics['app_ready_since_import_seconds'] = time.perf_counter() - _import_start
+threading.Thread(target=warm_up_analytics, daemon=True).start()
+
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=5001)
 
@@ -13,39 +13,122 @@
 # limitations under the License.
 
 
+import math
+import threading
+
+import numpy as np
 import pandas as pd
 
+from src.analytics import TransactionAnalytics
+
+# Columns that can be looked up through the typeahead search
+SEARCH_FIELDS = {
+    'from_account': 'From Account',
+    'to_account': 'To Account',
+    'from_sender': 'From Sender',
+    'to_recipient': 'To Recipient',
+}
+
 class TransactionData:
     def __init__(self, file):
         print(f"Loading transaction data from {file}")
         self.data = pd.read_csv(file)
+        self._analytics = None
+        self._analytics_lock = threading.Lock()
         self.prepare_data()
 
     def prepare_data(self):
-        self.data['From Account'] = self.data['From Account'].astype(str)
-        self.data['To Account'] = self.data['To Account'].astype(str)
-        self.data['From Sender'] = self.data['From Sender'].astype(str)
-        self.data['To Recipient'] = self.data['To Recipient'].astype(str)
-        self.data['Date'] = pd.to_datetime(self.data['Date'], format="mixed")
-        self.data = self.data[self.data['Amount in Euro'] > 0]
-
-        self.data['From Label'] = self.data.apply(
+        self.data = self.prepare_frame(self.data)
+        self.build_value_index()
+
+    @staticmethod
+    def prepare_frame(data):
+        data['From Account'] = data['From Account'].astype(str)
+        data['To Account'] = data['To Account'].astype(str)
+        data['From Sender'] = data['From Sender'].astype(str)
+        data['To Recipient'] = data['To Recipient'].astype(str)
+        data['Date'] = pd.to_datetime(data['Date'], format="mixed")
+        data = data[data['Amount in Euro'] > 0]
+
+        data['From Label'] = data.apply(
             lambda x: f"{x['From Sender']} ({x['From Account']})" if x['From Account'] else x['From Sender'],
             axis=1
         )
-        self.data['To Label'] = self.data.apply(
+        data['To Label'] = data.apply(
             lambda x: f"{x['To Recipient']} ({x['To Account']})" if x['To Account'] else x['To Recipient'],
             axis=1
         )
+        return data
+
+    def append_data(self, file):
+        print(f"Appending transaction data from {file}")
+        new_rows = self.prepare_frame(pd.read_csv(file))
+        self.data = pd.concat([self.data, new_rows], ignore_index=True)
+        self.build_value_index()
+
+        # Only the pairs that received new rows are recomputed
+        with self._analytics_lock:
+            if self._analytics is not None:
+                self._analytics.update(self.data, new_rows)
+        return new_rows
+
+    @property
+    def analytics(self):
+        # Recurring payment and outlier detection, computed on first use
+        with self._analytics_lock:
+            if self._analytics is None:
+                analytics = TransactionAnalytics()
+                analytics.compute(self.data)
+                self._analytics = analytics
+            return self._analytics
+
+    def build_value_index(self):
+        # Sorted unique values are computed once per dataset; the lowercase
+        # copies are sorted too so prefix lookups can use a binary search.
+        self.unique_values = {}
+        self.search_index = {}
+        for field, column in SEARCH_FIELDS.items():
+            # Object arrays, so one long value does not widen every entry
+            values = np.sort(np.asarray(pd.unique(self.data[column]), dtype=object))
+            lowered = pd.Series(values, dtype=object).str.lower()
+            order = np.argsort(lowered.to_numpy(dtype=object), kind='stable')
+            self.unique_values[field] = values.tolist()
+            self.search_index[field] = (lowered.iloc[order].reset_index(drop=True), values[order])
+
+    def search_values(self, field, query='', limit=50, offset=0):
+        if field not in self.search_index:
+            raise ValueError(f"Unknown search field: {field}")
+
+        lowered, values = self.search_index[field]
+        query = query.strip().lower()
+
+        if not query:
+            matches = self.unique_values[field]
+        else:
+            # Prefix matches first (contiguous in the sorted lowercase array),
+            # followed by values that only contain the query somewhere else.
+            start = lowered.searchsorted(query, side='left')
+            end = lowered.searchsorted(query + '\U0010ffff', side='left')
+            contains = lowered.str.contains(query, regex=False).to_numpy(dtype=bool, copy=True)
+            contains[start:end] = False
+            matches = values[start:end].tolist() + values[contains].tolist()
+
+        return {
+            'values': matches[offset:offset + limit],
+            'total': len(matches),
+            'offset': offset,
+            'limit': limit,
+            'has_more': offset + limit < len(matches)
+        }
 
     def filter_data(self, from_account, to_account, from_sender, to_recipient, min_amount, max_amount, from_date, to_date):
         print(f"Filtering data with parameters: {from_account}, {to_account}, {from_sender}, {to_recipient}, {min_amount}, {max_amount}, {from_date}, {to_date}")
         # First filter by accounts, senders, recipients and dates
         filtered_data = self.data[
-            ((self.data['From Account'].str.contains(from_account, case=False, na=False)) | (from_account == '')) &
-            ((self.data['To Account'].str.contains(to_account, case=False, na=False)) | (to_account == '')) &
-            ((self.data['From Sender'].str.contains(from_sender, case=False, na=False)) | (from_sender == '')) &
-            ((self.data['To Recipient'].str.contains(to_recipient, case=False, na=False)) | (to_recipient == '')) &
+            ((self.data['From Account'].str.contains(from_account, case=False, na=False, regex=False)) | (from_account == '')) &
+            ((self.data['To Account'].str.contains(to_account, case=False, na=False, regex=False)) | (to_account == '')) &
+            ((self.data['From Sender'].str.contains(from_sender, case=False, na=False, regex=False)) | (from_sender == '')) &
+            ((self.data['To Recipient'].str.contains(to_recipient, case=False, na=False, regex=False)) | (to_recipient == '')) &
             (self.data['Date'] >= from_date) &
             (self.data['Date'] <= to_date)
         ]
@@ -65,15 +148,63 @@ class TransactionData:
         print(f"Filtered data shape: {final_data.shape}")
         return final_data
 
+    def preview_data(self, sample_size=50000, max_pairs=500, z=1.96, seed=0):
+        # Approximate per-pair aggregate from a uniform row sample. Pair totals
+        # and counts are estimated as domain totals (scaled by N / n) with
+        # z-standard-error bounds including the finite population correction.
+        # Only the max_pairs pairs with the largest estimated amount are kept.
+        total_rows = len(self.data)
+        sample_size = min(sample_size, total_rows)
+        rng = np.random.default_rng(seed)
+        positions = np.sort(rng.choice(total_rows, size=sample_size, replace=False))
+        sample = self.data.iloc[positions][['From Label', 'To Label', 'Amount in Euro']]
+
+        scale = total_rows / sample_size
+        fpc = 1 - sample_size / total_rows
+        denominator = max(sample_size - 1, 1)
+
+        amounts = sample['Amount in Euro'].to_numpy(dtype=float)
+        grouped = sample.assign(**{'Amount Squared': amounts ** 2}).groupby(['From Label', 'To Label']).agg(
+            amount=('Amount in Euro', 'sum'),
+            amount_squared=('Amount Squared', 'sum'),
+            count=('Amount in Euro', 'size')
+        ).reset_index()
+
+        # Sample variance of y_i = amount (or 1) inside the pair and 0 outside
+        amount_var = (grouped['amount_squared'] - grouped['amount'] ** 2 / sample_size) / denominator
+        count_var = (grouped['count'] - grouped['count'] ** 2 / sample_size) / denominator
+        bound = z * total_rows * np.sqrt(fpc / sample_size)
+
+        preview = pd.DataFrame({
+            'From Label': grouped['From Label'],
+            'To Label': grouped['To Label'],
+            'Amount in Euro': grouped['amount'] * scale,
+            'Amount Error': bound * np.sqrt(amount_var.clip(lower=0)),
+            'Date': (grouped['count'] * scale).round().astype(int),
+            'Count Error': bound * np.sqrt(count_var.clip(lower=0))
+        })
+        pairs_in_sample = len(preview)
+        if pairs_in_sample > max_pairs:
+            preview = preview.nlargest(max_pairs, 'Amount in Euro')
+
+        amount_std = amounts.std(ddof=1) if sample_size > 1 else 0.0
+        summary = {
+            'total_rows': int(total_rows),
+            'sample_rows': int(sample_size),
+            'confidence': math.erf(z / math.sqrt(2)),
+            'total_amount': float(amounts.sum() * scale),
+            'total_amount_error': float(bound * amount_std),
+            'pairs_in_sample': int(pairs_in_sample),
+            'pairs_shown': int(len(preview)),
+            'omitted_amount': float(amounts.sum() * scale - preview['Amount in Euro'].sum())
+        }
+        return preview, summary
+
     def get_unique_accounts(self):
-        unique_from_accounts = sorted(self.data['From Account'].unique().tolist())
-        unique_to_accounts = sorted(self.data['To Account'].unique().tolist())
-        return unique_from_accounts, unique_to_accounts
+        return self.unique_values['from_account'], self.unique_values['to_account']
 
     def get_unique_senders_recipients(self):
-        unique_senders = sorted(self.data['From Sender'].unique().tolist())
-        unique_recipients = sorted(self.data['To Recipient'].unique().tolist())
-        return unique_senders, unique_recipients
+        return self.unique_values['from_sender'], self.unique_values['to_recipient']
 
     def get_transaction_history(self, from_label, to_label, 
                               from_account='', to_account='',
@@ -92,13 +223,13 @@ class TransactionData:
         
         # Apply additional filters if provided
         if from_account:
-            filtered_data = filtered_data[filtered_data['From Account'].str.contains(from_account, case=False, na=False)]
+            filtered_data = filtered_data[filtered_data['From Account'].str.contains(from_account, case=False, na=False, regex=False)]
         if to_account:
-            filtered_data = filtered_data[filtered_data['To Account'].str.contains(to_account, case=False, na=False)]
+            filtered_data = filtered_data[filtered_data['To Account'].str.contains(to_account, case=False, na=False, regex=False)]
         if from_sender:
-            filtered_data = filtered_data[filtered_data['From Sender'].str.contains(from_sender, case=False, na=False)]
+            filtered_data = filtered_data[filtered_data['From Sender'].str.contains(from_sender, case=False, na=False, regex=False)]
         if to_recipient:
-            filtered_data = filtered_data[filtered_data['To Recipient'].str.contains(to_recipient, case=False, na=False)]
+            filtered_data = filtered_data[filtered_data['To Recipient'].str.contains(to_recipient, case=False, na=False, regex=False)]
         
         # Apply numeric and date filters
         filtered_data = filtered_data[
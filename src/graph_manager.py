@@ -13,32 +13,59 @@
 # limitations under the License.
 
 
-import networkx as nx
-from pyvis.network import Network
 import json
 from datetime import datetime
 
+# Optional per-pair columns that are carried over to the edges
+EDGE_COLUMNS = ['Amount Error', 'Recurring', 'Period', 'Outliers']
+
 class TransactionGraph:
+    # networkx and pyvis are imported on first use so that the app can serve
+    # its first pages before the graph stack has been loaded. The pyvis
+    # Network is only built when HTML output is requested; everything else
+    # works on plain vis.js style node and edge dicts.
     def __init__(self, data):
         self.data = data
-        self.net = Network(height='750px', width='100%', directed=True, notebook=False)
+        self.nodes = []
+        self.edges = []
+        self.physics_enabled = True
 
     def create_graph(self):
+        import networkx as nx
+
         print("Creating graph...")
         
-        # Data is already grouped when passed in
+        # Data is already grouped when passed in; empty periods come back
+        # as NaN when the data has been round-tripped through a CSV file
+        data = self.data.fillna({'Period': ''}) if 'Period' in self.data else self.data
         G = nx.from_pandas_edgelist(
-            self.data, 
+            data, 
             source='From Label', 
             target='To Label', 
-            edge_attr='Amount in Euro', 
+            edge_attr=['Amount in Euro'] + [column for column in EDGE_COLUMNS if column in self.data], 
             create_using=nx.DiGraph()
         )
-        self.net.from_nx(G)
+
+        # Same node and edge order as pyvis' Network.from_nx
+        node_ids = set()
+        self.nodes = []
+        self.edges = []
+
+        def add_node(node_id):
+            if node_id not in node_ids:
+                node_ids.add(node_id)
+                self.nodes.append({'id': node_id, 'label': str(node_id), 'shape': 'dot', 'size': 10})
+
+        for source, target, attrs in G.edges(data=True):
+            add_node(source)
+            add_node(target)
+            self.edges.append({'from': source, 'to': target, 'width': 1, **attrs})
+        for node_id in nx.isolates(G):
+            add_node(node_id)
 
     def customize_graph(self, display_amounts, proportional_edges):
         print(f"Customizing graph, display_amounts: {display_amounts}, proportional_edges: {proportional_edges}")
-        for node in self.net.nodes:
+        for node in self.nodes:
             # Add a line break between Sender and Account in the title
             sender, account = self.split_label(node['id'])
 
@@ -47,7 +74,7 @@ class TransactionGraph:
             node['shape'] = 'dot'
             node['image'] = ''
 
-        for edge in self.net.edges:
+        for edge in self.edges:
             if display_amounts:
                 edge['label'] = f"€{edge['Amount in Euro']:,.2f}"
             if proportional_edges:
@@ -55,6 +82,16 @@ class TransactionGraph:
             amount = edge.get('Amount in Euro', 0)
             formatted_amount = f"{amount:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
             edge['title'] = f"Total Amount: {formatted_amount} EUR"
+            if 'Amount Error' in edge:
+                # Approximate preview: amounts are estimates with an error bound
+                formatted_error = f"{edge['Amount Error']:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+                formatted_amount = f"≈{formatted_amount}"
+                edge['title'] = f"Estimated Total Amount: {formatted_amount} ± {formatted_error} EUR"
+            if edge.get('Recurring'):
+                edge['title'] += f" | Recurring payment ({edge.get('Period') or 'regular'})"
+                edge['dashes'] = True
+            if edge.get('Outliers'):
+                edge['title'] += f" | Unusual transactions: {int(edge['Outliers'])}"
             
             if proportional_edges:
                 edge['value'] = amount
@@ -67,14 +104,23 @@ class TransactionGraph:
     def toggle_physics(self, enable_physics):
         if not enable_physics:
             # Save current node positions when disabling physics
-            for node in self.net.nodes:
+            for node in self.nodes:
                 if 'x' not in node or 'y' not in node:
                     node['x'] = None
                     node['y'] = None
-        self.net.toggle_physics(enable_physics)
+        self.physics_enabled = enable_physics
 
     def get_graph_data(self):
         print("Getting graph data...")
+
+        # Recurring payments and outliers per node, from the incident edges
+        node_recurring = {}
+        node_outliers = {}
+        for edge in self.edges:
+            for node_id in (edge["from"], edge["to"]):
+                node_recurring[node_id] = node_recurring.get(node_id, 0) + int(bool(edge.get("Recurring", False)))
+                node_outliers[node_id] = node_outliers.get(node_id, 0) + int(edge.get("Outliers", 0))
+
         return {
             "nodes": [{
                 "id": node["id"], 
@@ -83,21 +129,27 @@ class TransactionGraph:
                 "shape": node.get("shape", "dot"),
                 "image": node.get("image", ""),
                 "x": node.get("x"),
-                "y": node.get("y")
-            } for node in self.net.nodes],
+                "y": node.get("y"),
+                "recurring": node_recurring.get(node["id"], 0),
+                "outliers": node_outliers.get(node["id"], 0)
+            } for node in self.nodes],
             "edges": [{
                 "from": edge["from"], 
                 "to": edge["to"], 
                 "label": edge.get("label", ""), 
                 "title": edge["title"], 
-                "value": edge["value"]
-            } for edge in self.net.edges]
+                "value": edge["value"],
+                "dashes": edge.get("dashes", False),
+                "recurring": bool(edge.get("Recurring", False)),
+                "period": str(edge.get("Period", "")),
+                "outliers": int(edge.get("Outliers", 0))
+            } for edge in self.edges]
         }
 
     def save_graph_state(self, file_path, filters):
         graph_state = {
-            "nodes": self.net.nodes,
-            "edges": self.net.edges,
+            "nodes": self.nodes,
+            "edges": self.edges,
             "filters": filters
         }
         with open(file_path, 'w') as f:
@@ -112,8 +164,8 @@ class TransactionGraph:
             for k, v in graph_state["filters"].items()
         }
 
-        self.net.nodes = graph_state["nodes"]
-        self.net.edges = graph_state["edges"]
+        self.nodes = graph_state["nodes"]
+        self.edges = graph_state["edges"]
         return filters
 
     @staticmethod
@@ -135,5 +187,20 @@ class TransactionGraph:
             account = ''
         return sender, account
 
+    def build_network(self):
+        from pyvis.network import Network
+
+        # Going through add_node/add_edge keeps pyvis' defaults such as the
+        # node colour and the arrows of directed edges
+        net = Network(height='750px', width='100%', directed=True, notebook=False)
+        for node in self.nodes:
+            options = {key: value for key, value in node.items() if key != 'id'}
+            net.add_node(node['id'], **options)
+        for edge in self.edges:
+            options = {key: value for key, value in edge.items() if key not in ('from', 'to')}
+            net.add_edge(edge['from'], edge['to'], **options)
+        net.toggle_physics(self.physics_enabled)
+        return net
+
     def generate_html(self, file_path):
-        self.net.show(file_path)
+        self.build_network().show(file_path)
@@ -20,6 +20,7 @@
 let network;
 let currentNodes = [];
 let filteredData;
+let awaitingExactGraph = false;
 
 function initializeGraph(data) {
     const container = document.getElementById('graph');
@@ -89,6 +90,7 @@ function saveNodePositions() {
 
 function updateGraph() {
     console.log("Updating graph...");
+    awaitingExactGraph = false;  // Filtered results supersede the preview
 
     const formData = new FormData();
     ['from_account', 'to_account', 'from_sender', 'to_recipient', 'min_amount', 'max_amount', 'from_date', 'to_date', 'display_amounts', 'enable_physics', 'proportional_edges'].forEach(id => {
@@ -102,42 +104,90 @@ function updateGraph() {
     .then(response => response.json())
     .then(data => {
         console.log("Received data from server:", data);
-        filteredData = data.filtered_data;  // Store the filtered data
-        const container = document.getElementById('graph');
+        renderGraphResponse(data);
+    })
+    .catch(error => {
+        console.error("Error updating graph:", error);
+    });
+}
 
-        if (data.graph_data.nodes.length === 0 && data.graph_data.edges.length === 0) {
-            console.log("No data to display");
-            container.innerHTML = "<p>No data to display. Try adjusting your filters.</p>";
-        } else {
-            if (network) {
-                network.destroy();
+function renderGraphResponse(data) {
+    filteredData = data.filtered_data;  // Store the filtered data
+    const container = document.getElementById('graph');
+
+    if (data.graph_data.nodes.length === 0 && data.graph_data.edges.length === 0) {
+        console.log("No data to display");
+        container.innerHTML = "<p>No data to display. Try adjusting your filters.</p>";
+    } else {
+        if (network) {
+            network.destroy();
+        }
+        const options = getGraphOptions();
+        
+        // Apply saved positions to nodes
+        data.graph_data.nodes.forEach(node => {
+            if (currentNodes[node.id]) {
+                node.x = currentNodes[node.id].x;
+                node.y = currentNodes[node.id].y;
             }
-            const options = getGraphOptions();
-            
-            // Apply saved positions to nodes
-            data.graph_data.nodes.forEach(node => {
-                if (currentNodes[node.id]) {
-                    node.x = currentNodes[node.id].x;
-                    node.y = currentNodes[node.id].y;
-                }
-            });
+        });
 
-            network = new vis.Network(container, data.graph_data, options);
-            console.log("Updating label selects and filtering transactions");
-            updateLabelSelects(data.graph_data.nodes);
-            filterTransactions(); // Add this line to update the transaction table
+        network = new vis.Network(container, data.graph_data, options);
+        console.log("Updating label selects and filtering transactions");
+        updateLabelSelects(data.graph_data.nodes);
+        filterTransactions(); // Add this line to update the transaction table
 
-            // Save node positions when stabilized
-            network.on("stabilized", function () {
-                saveNodePositions();
-            });
-        }
+        // Save node positions when stabilized
+        network.on("stabilized", function () {
+            saveNodePositions();
+        });
+    }
 
-        // Update Summary Statistics as Watermark
-        updateSummaryWatermark(data.summary_stats);
+    // Update Summary Statistics as Watermark
+    updateSummaryWatermark(data.summary_stats);
+}
+
+function showPreviewWatermark(preview) {
+    const watermark = document.getElementById('summaryWatermark');
+    if (watermark) {
+        const confidence = Math.round(preview.confidence * 100);
+        // Only the largest pairs of the sample are drawn in the preview
+        const omittedPairs = preview.pairs_shown < preview.pairs_in_sample ?
+            `Showing top ${preview.pairs_shown.toLocaleString('de-DE')} of ${preview.pairs_in_sample.toLocaleString('de-DE')} sampled pairs (others ≈ €${formatCurrency(preview.omitted_amount)}) |` : '';
+        watermark.innerHTML = `
+            Approximate preview from ${preview.sample_rows.toLocaleString('de-DE')} of ${preview.total_rows.toLocaleString('de-DE')} transactions |
+            Estimated Total Volume: €${formatCurrency(preview.total_amount)} ± €${formatCurrency(preview.total_amount_error)} (${confidence}%) |
+            ${omittedPairs}
+            Computing exact graph...
+        `;
+    }
+}
+
+function pollExactGraph() {
+    if (!awaitingExactGraph) {
+        return;
+    }
+    fetch('/get_initial_graph')
+    .then(response => response.json())
+    .then(data => {
+        if (!awaitingExactGraph) {
+            return;
+        }
+        if (data.ready) {
+            awaitingExactGraph = false;
+            console.log("Exact graph ready, replacing preview");
+            renderGraphResponse(data);
+        } else if (data.error) {
+            // Fall back to requesting the graph directly
+            console.error("Error computing exact graph:", data.error);
+            updateGraph();
+        } else {
+            setTimeout(pollExactGraph, 1000);
+        }
     })
     .catch(error => {
-        console.error("Error updating graph:", error);
+        console.error("Error fetching exact graph:", error);
+        setTimeout(pollExactGraph, 1000);
     });
 }
 
@@ -285,7 +335,16 @@ window.addEventListener('load', function() {
     console.log("Window loaded");
     console.log("Initial graph data:", initialGraphData);
     initializeGraph(initialGraphData);
-    updateGraph(); // To populate the watermark with initial data
+    if (awaitExactGraph) {
+        // Keep the preview, if any, until the exact graph has been computed
+        if (previewInfo) {
+            showPreviewWatermark(previewInfo);
+        }
+        awaitingExactGraph = true;
+        pollExactGraph();
+    } else {
+        updateGraph(); // To populate the watermark with initial data
+    }
 
     // Initialize collapsible menus
     const coll = document.getElementsByClassName("collapsible-button");
@@ -348,6 +407,54 @@ document.querySelectorAll('#from_account, #to_account, #from_sender, #to_recipie
     element.addEventListener('change', applyFilters);
 });
 
+// Typeahead for accounts, senders and recipients; options are fetched
+// from the server page by page instead of being embedded in the page
+const TYPEAHEAD_LIMIT = 50;
+
+function setupTypeahead(fieldId) {
+    const input = document.getElementById(fieldId);
+    const datalist = document.getElementById(`${fieldId}_options`);
+    if (!input || !datalist) {
+        return;
+    }
+    let debounceTimer;
+    let requestId = 0;
+
+    input.addEventListener('input', function() {
+        clearTimeout(debounceTimer);
+        debounceTimer = setTimeout(() => {
+            const currentRequest = ++requestId;
+            fetchSearchValues(fieldId, input.value, TYPEAHEAD_LIMIT, 0)
+                .then(data => {
+                    // Drop responses that arrive after a newer query was sent
+                    if (currentRequest !== requestId) {
+                        return;
+                    }
+                    datalist.innerHTML = '';
+                    data.values.forEach(value => {
+                        const option = document.createElement('option');
+                        option.value = value;
+                        datalist.appendChild(option);
+                    });
+                })
+                .catch(error => console.error(`Error searching ${fieldId}:`, error));
+        }, 200);
+    });
+}
+
+function fetchSearchValues(field, query, limit, offset) {
+    const params = new URLSearchParams({
+        field: field,
+        q: query,
+        limit: limit,
+        offset: offset
+    });
+    return fetch(`/search_values?${params.toString()}`)
+        .then(response => response.json());
+}
+
+['from_account', 'to_account', 'from_sender', 'to_recipient'].forEach(setupTypeahead);
+
 function viewTransactionTable(useFilters = false) {
     let url = '/transaction_table?';
     if (useFilters) {